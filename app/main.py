@@ -1,13 +1,38 @@
-from fastapi import FastAPI, HTTPException
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from starlette.staticfiles import NotModifiedResponse
+from fastapi.responses import FileResponse, ORJSONResponse, Response, StreamingResponse
 from pydantic import BaseModel
+from starlette.datastructures import Headers
+from collections import OrderedDict
+import anyio
+import asyncio
+import hashlib
+import logging
+import mimetypes
 import os
-import requests
+import stat
+import httpx
+import orjson
 import re
 
 
+logger = logging.getLogger(__name__)
+
+# Read credentials once at import; the request path reuses the prebuilt headers
+_API_KEY = os.environ.get("ABACUS_API_KEY")
+_HEADERS = {
+    "Authorization": f"Bearer {_API_KEY}",
+    "Content-Type": "application/json",
+    "Accept-Encoding": "gzip, deflate, br, zstd",
+} if _API_KEY else None
+
+# Model may be configurable; default to gpt-5 to mirror your examples
+_MODEL = os.getenv("ABACUS_MODEL", "gpt-5-mini")
+
+
 class OptimizeRequest(BaseModel):
     dockerfile: str
 
@@ -17,7 +42,27 @@ class OptimizeResponse(BaseModel):
     summary: str
 
 
-app = FastAPI(title="Dockerfile Optimizer", version="0.2.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if _HEADERS is None:
+        # Keep serving the UI for local development; optimize calls return 500
+        logger.error("ABACUS_API_KEY is not set; optimize requests will fail")
+    # One shared client per process so Abacus calls reuse keep-alive connections
+    app.state.http = httpx.AsyncClient(
+        http2=True,
+        timeout=60.0,
+        limits=httpx.Limits(max_keepalive_connections=20, max_connections=50),
+    )
+    yield
+    await app.state.http.aclose()
+
+
+app = FastAPI(
+    title="Dockerfile Optimizer",
+    version="0.2.0",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse,
+)
 
 app.add_middleware(
     CORSMiddleware,
@@ -28,35 +73,144 @@ app.add_middleware(
 )
 
 
+_FENCE = "```"
+_FROM_RE = re.compile(r"^\s*FROM\s", re.IGNORECASE | re.MULTILINE)
+_SUMMARY_SEP = "---SUMMARY---"
+_URL = "https://routellm.abacus.ai/v1/chat/completions"
+_SYSTEM_PROMPT = (
+    "You are an expert DevOps assistant specialized in Dockerfile optimization. "
+    "Return your response in exactly this format:\n\n"
+    "```dockerfile\n[OPTIMIZED_DOCKERFILE_CONTENT]\n```\n\n"
+    "---SUMMARY---\n"
+    "[Brief summary of changes and optimizations made]\n\n"
+    "Do not include any other text or explanations outside these sections."
+)
+
+# Bounded LRU of prior results so identical submissions skip the Abacus call
+_CACHE: "OrderedDict[bytes, OptimizeResponse]" = OrderedDict()
+_CACHE_MAX = 1024
+
+# Load shedding: reject new Abacus calls with 503 once this many are in flight
+_OPTIMIZE_LIMIT = 32
+_OPTIMIZE_SEM = asyncio.Semaphore(_OPTIMIZE_LIMIT)
+
+# Hard cap on Abacus response bodies to keep worker memory bounded
+_MAX_RESPONSE_BYTES = 256 * 1024
+# Streamed completions repeat the chunk envelope (id, model, choices...) per token,
+# so the raw SSE body runs several times larger than the text it carries
+_MAX_STREAM_BYTES = 8 * _MAX_RESPONSE_BYTES
+
+
 static_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), "static")
 
+# Variants written by `python -m app.precompress`, in order of preference
+_PRECOMPRESSED = (("br", ".br"), ("gzip", ".gz"))
+_HASHED_ASSET_RE = re.compile(r"\.[0-9a-f]{8,}\.\w+$")
+
+
+def _accepted_encodings(header: str) -> set:
+    """Parse Accept-Encoding, dropping codings the client refuses with q=0."""
+    accepted = set()
+    for token in header.split(","):
+        name, _, params = token.partition(";")
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key.lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if q > 0:
+            accepted.add(name.strip().lower())
+    return accepted
+
+
+class PrecompressedStaticFiles(StaticFiles):
+    """StaticFiles that serves build-time .br/.gz variants when the client accepts them."""
+
+    async def get_response(self, path: str, scope) -> Response:
+        if scope["method"] in ("GET", "HEAD"):
+            response = await anyio.to_thread.run_sync(self._precompressed_response, path, scope)
+            if response is not None:
+                return response
+        return await super().get_response(path, scope)
+
+    def _precompressed_response(self, path: str, scope):
+        full_path, stat_result = self.lookup_path(path)
+        if stat_result is not None and stat.S_ISDIR(stat_result.st_mode) and self.html:
+            full_path, stat_result = self.lookup_path(os.path.join(path, "index.html"))
+        if stat_result is None or not stat.S_ISREG(stat_result.st_mode):
+            return None
+
+        request_headers = Headers(scope=scope)
+        accepted = _accepted_encodings(request_headers.get("accept-encoding", ""))
+        for encoding, suffix in _PRECOMPRESSED:
+            if encoding not in accepted:
+                continue
+            try:
+                variant_stat = os.stat(full_path + suffix)
+            except OSError:
+                continue
+            # Skip variants older than their source, e.g. after editing under --reload
+            if variant_stat.st_mtime < stat_result.st_mtime:
+                continue
+            headers = {"Content-Encoding": encoding, "Vary": "Accept-Encoding"}
+            if _HASHED_ASSET_RE.search(path):
+                headers["Cache-Control"] = "public, max-age=31536000, immutable"
+            media_type = mimetypes.guess_type(full_path)[0] or "application/octet-stream"
+            response = FileResponse(
+                full_path + suffix, media_type=media_type, headers=headers, stat_result=variant_stat
+            )
+            # Same revalidation StaticFiles.file_response() does, against the variant's ETag
+            if self.is_not_modified(response.headers, request_headers):
+                return NotModifiedResponse(response.headers)
+            return response
+        return None
+
+
+_HEALTH = b'{"status":"ok"}'
+_HEALTH_HEADERS = [
+    (b"content-type", b"application/json"),
+    (b"content-length", str(len(_HEALTH)).encode()),
+]
+
+
+class HealthzFastPath:
+    """Raw ASGI middleware answering /healthz before CORS and the rest of the stack."""
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] == "http" and scope["path"] == "/healthz" and scope["method"] in ("GET", "HEAD"):
+            await send({"type": "http.response.start", "status": 200, "headers": _HEALTH_HEADERS})
+            await send({"type": "http.response.body", "body": b"" if scope["method"] == "HEAD" else _HEALTH})
+            return
+        await self.app(scope, receive, send)
+
+
+# Registered last so it wraps every other middleware
+app.add_middleware(HealthzFastPath)
+
 
 @app.get("/healthz")
 def healthcheck() -> dict:
+    # Only reached for methods the fast path passes through, which get 405 here
     return {"status": "ok"}
 
 
-@app.post("/api/optimize", response_model=OptimizeResponse)
-def optimize(req: OptimizeRequest) -> OptimizeResponse:
+def _build_request(req: OptimizeRequest) -> tuple[dict, dict]:
     if not req.dockerfile or req.dockerfile.strip() == "":
         raise HTTPException(status_code=400, detail="dockerfile is required")
+    if not _FROM_RE.search(req.dockerfile):
+        raise HTTPException(
+            status_code=400, detail="input does not appear to be a Dockerfile (no FROM instruction)"
+        )
 
-    api_key = os.getenv("ABACUS_API_KEY")
-    if not api_key:
+    if _HEADERS is None:
         raise HTTPException(status_code=500, detail="ABACUS_API_KEY is not set")
 
-    # Model may be configurable; default to gpt-5 to mirror your examples
-    model = os.getenv("ABACUS_MODEL", "gpt-5-mini")
-
-    system_prompt = (
-        "You are an expert DevOps assistant specialized in Dockerfile optimization. "
-        "Return your response in exactly this format:\n\n"
-        "```dockerfile\n[OPTIMIZED_DOCKERFILE_CONTENT]\n```\n\n"
-        "---SUMMARY---\n"
-        "[Brief summary of changes and optimizations made]\n\n"
-        "Do not include any other text or explanations outside these sections."
-    )
-
     user_prompt = f"""
 Optimize the following Dockerfile for better performance, less layers, smaller image size, and faster build time.
 
@@ -69,30 +223,215 @@ Original Dockerfile:
 ```
 """
 
-    url = "https://routellm.abacus.ai/v1/chat/completions"
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json",
-    }
     payload = {
-        "model": model,
+        "model": _MODEL,
         "messages": [
-            {"role": "system", "content": system_prompt},
+            {"role": "system", "content": _SYSTEM_PROMPT},
             {"role": "user", "content": user_prompt},
         ],
         "stream": False,
         "temperature": 0.2,
     }
+    return _HEADERS, payload
+
+
+def _parse_content(content: str) -> tuple[str, str]:
+    """Split an LLM response into (dockerfile, summary)."""
+    dockerfile_content = ""
+
+    # Split by summary separator; tail is empty when it is absent
+    head, _sep, tail = content.partition(_SUMMARY_SEP)
+    summary_content = tail.strip()
+
+    # Extract Dockerfile from fenced code block with two plain scans
+    start = head.find(_FENCE)
+    end = head.find(_FENCE, start + len(_FENCE)) if start >= 0 else -1
+    if end > 0:
+        body = head[start + len(_FENCE):end]
+        if body[:10].lower() == "dockerfile":
+            body = body[10:]
+        dockerfile_content = body.strip()
+    else:
+        # Fallback: extract from first FROM line
+        from_match = _FROM_RE.search(head)
+        if from_match:
+            dockerfile_content = head[from_match.start():].strip()
+
+    return dockerfile_content, summary_content
+
+
+class IncrementalParser:
+    """Stateful parser that splits streamed LLM tokens into Dockerfile and summary deltas."""
+
+    def __init__(self) -> None:
+        self.state = "preamble"
+        self.buffer = ""
+        self.summary_started = False
+
+    def feed(self, text: str) -> list:
+        """Consume a chunk of text and return a list of (section, delta) tuples."""
+        self.buffer += text
+        events = []
+        while True:
+            if self.state == "preamble":
+                idx = self.buffer.find(_FENCE)
+                sep = self.buffer.find(_SUMMARY_SEP)
+                if sep >= 0 and (idx < 0 or sep < idx):
+                    self.buffer = self.buffer[sep + len(_SUMMARY_SEP):]
+                    self.state = "summary"
+                elif idx >= 0:
+                    self.buffer = self.buffer[idx + len(_FENCE):]
+                    self.state = "fence"
+                else:
+                    # Keep a tail that may hold a partial marker
+                    self.buffer = self.buffer[-(len(_SUMMARY_SEP) - 1):]
+                    return events
+            elif self.state == "fence":
+                # Drop the rest of the opening fence line (language tag)
+                nl = self.buffer.find("\n")
+                if nl < 0:
+                    return events
+                self.buffer = self.buffer[nl + 1:]
+                self.state = "dockerfile"
+            elif self.state == "dockerfile":
+                idx = self.buffer.find(_FENCE)
+                if idx >= 0:
+                    if idx:
+                        events.append(("dockerfile", self.buffer[:idx]))
+                    self.buffer = self.buffer[idx + len(_FENCE):]
+                    self.state = "after"
+                    continue
+                keep = len(self.buffer) - len(self.buffer.rstrip("`"))
+                emit = self.buffer[:len(self.buffer) - keep]
+                if emit:
+                    events.append(("dockerfile", emit))
+                self.buffer = self.buffer[len(emit):]
+                return events
+            elif self.state == "after":
+                sep = self.buffer.find(_SUMMARY_SEP)
+                if sep < 0:
+                    self.buffer = self.buffer[-(len(_SUMMARY_SEP) - 1):]
+                    return events
+                self.buffer = self.buffer[sep + len(_SUMMARY_SEP):]
+                self.state = "summary"
+            else:
+                if not self.summary_started:
+                    self.buffer = self.buffer.lstrip()
+                if self.buffer:
+                    events.append(("summary", self.buffer))
+                    self.summary_started = True
+                self.buffer = ""
+                return events
+
+
+def _cache_key(model: str, dockerfile: str) -> bytes:
+    return hashlib.blake2b(f"{model}\0{dockerfile}".encode(), digest_size=16).digest()
+
 
+def _cache_get(key: bytes):
+    cached = _CACHE.get(key)
+    if cached is not None:
+        _CACHE.move_to_end(key)
+    return cached
+
+
+def _cache_put(key: bytes, value: OptimizeResponse) -> None:
+    _CACHE[key] = value
+    _CACHE.move_to_end(key)
+    if len(_CACHE) > _CACHE_MAX:
+        _CACHE.popitem(last=False)
+
+
+def _shed_if_busy() -> None:
+    if _OPTIMIZE_SEM.locked():
+        raise HTTPException(
+            status_code=503,
+            detail="Too many concurrent optimize requests, try again later",
+            headers={"Retry-After": "1"},
+        )
+
+
+async def _acquire_slot():
+    """Take a load-shedding slot without waiting; return an idempotent release callback."""
+    _shed_if_busy()
+    # Never suspends here: the semaphore was just seen unlocked
+    await _OPTIMIZE_SEM.acquire()
+    released = False
+
+    def release() -> None:
+        nonlocal released
+        if not released:
+            released = True
+            _OPTIMIZE_SEM.release()
+
+    return release
+
+
+class _SlotStreamingResponse(StreamingResponse):
+    """StreamingResponse that frees its load-shedding slot even if the body never starts."""
+
+    def __init__(self, content, release, **kwargs) -> None:
+        super().__init__(content, **kwargs)
+        self.release = release
+
+    async def __call__(self, scope, receive, send) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self.release()
+
+
+async def _read_capped(resp: httpx.Response) -> bytes:
+    buf = bytearray()
+    async for chunk in resp.aiter_bytes(8192):
+        buf += chunk
+        if len(buf) > _MAX_RESPONSE_BYTES:
+            raise HTTPException(status_code=502, detail="Abacus response too large")
+    return bytes(buf)
+
+
+async def _aiter_capped_lines(resp: httpx.Response):
+    """Yield SSE lines while counting raw bytes read, unlike aiter_lines() which buffers any line."""
+    total = 0
+    pending = b""
+    async for chunk in resp.aiter_bytes(8192):
+        total += len(chunk)
+        if total > _MAX_STREAM_BYTES:
+            raise HTTPException(status_code=502, detail="Abacus response too large")
+        *lines, pending = (pending + chunk).split(b"\n")
+        for line in lines:
+            yield line.rstrip(b"\r").decode(errors="replace")
+    if pending:
+        yield pending.rstrip(b"\r").decode(errors="replace")
+
+
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {orjson.dumps(data).decode()}\n\n"
+
+
+@app.post("/api/optimize", response_model=OptimizeResponse)
+async def optimize(req: OptimizeRequest, request: Request) -> OptimizeResponse:
+    headers, payload = _build_request(req)
+    key = _cache_key(payload["model"], req.dockerfile)
+    cached = _cache_get(key)
+    if cached is not None:
+        return cached
+
+    release = await _acquire_slot()
     try:
-        resp = requests.post(url, headers=headers, json=payload, timeout=60)
+        async with request.app.state.http.stream(
+            "POST", _URL, headers=headers, content=orjson.dumps(payload)
+        ) as resp:
+            body = await _read_capped(resp)
         if resp.status_code >= 400:
-            raise HTTPException(status_code=resp.status_code, detail=resp.text)
-        data = resp.json()
+            raise HTTPException(status_code=resp.status_code, detail=body.decode(errors="replace"))
+        data = orjson.loads(body)
     except HTTPException:
         raise
     except Exception as exc:  # pragma: no cover
         raise HTTPException(status_code=502, detail=f"Abacus request failed: {exc}")
+    finally:
+        release()
 
     content = ""
     try:
@@ -106,49 +445,81 @@ Original Dockerfile:
     if not content:
         raise HTTPException(status_code=502, detail="Empty response from Abacus ChatLLM")
 
-    # Extract Dockerfile and summary from response
-    dockerfile_content = ""
-    summary_content = ""
-    
-    try:
-        # Split by summary separator
-        parts = content.split("---SUMMARY---", 1)
-        if len(parts) == 2:
-            dockerfile_section = parts[0].strip()
-            summary_content = parts[1].strip()
-            
-            # Extract Dockerfile from fenced code block
-            match = re.search(r"```(?:dockerfile)?\s*([\s\S]*?)```", dockerfile_section, re.IGNORECASE)
-            if match:
-                dockerfile_content = match.group(1).strip()
-            else:
-                # Fallback: extract from first FROM line
-                lines = dockerfile_section.splitlines()
-                start_idx = next((i for i, ln in enumerate(lines) if ln.strip().upper().startswith("FROM ")), None)
-                if start_idx is not None:
-                    dockerfile_content = "\n".join(lines[start_idx:]).strip()
-        else:
-            # Fallback: try to extract just Dockerfile
-            match = re.search(r"```(?:dockerfile)?\s*([\s\S]*?)```", content, re.IGNORECASE)
-            if match:
-                dockerfile_content = match.group(1).strip()
-            else:
-                lines = content.splitlines()
-                start_idx = next((i for i, ln in enumerate(lines) if ln.strip().upper().startswith("FROM ")), None)
-                if start_idx is not None:
-                    dockerfile_content = "\n".join(lines[start_idx:]).strip()
-    except Exception:
-        dockerfile_content = content  # fallback to full content
+    dockerfile_content, summary_content = _parse_content(content)
+    result = OptimizeResponse(result=dockerfile_content, summary=summary_content)
+    # Don't pin a reply we couldn't parse; a retry may succeed
+    if dockerfile_content:
+        _cache_put(key, result)
+    return result
+
 
-    return OptimizeResponse(result=dockerfile_content, summary=summary_content)
+@app.post("/api/optimize/stream")
+async def optimize_stream(req: OptimizeRequest, request: Request) -> StreamingResponse:
+    headers, payload = _build_request(req)
+    client = request.app.state.http
+    key = _cache_key(payload["model"], req.dockerfile)
 
+    cached = _cache_get(key)
+    if cached is not None:
+        async def replay():
+            yield _sse("done", cached.model_dump())
 
-@app.get("/index.html")
-def index_html() -> FileResponse:  # type: ignore[override]
-    return FileResponse(os.path.join(static_dir, "index.html"))
+        return StreamingResponse(replay(), media_type="text/event-stream")
 
+    # Take the slot before the 200 goes out so overload is still a 503
+    release = await _acquire_slot()
 
-# Mount static at the end to avoid intercepting API routes
-app.mount("/", StaticFiles(directory=static_dir, html=True), name="static")
+    async def gen():
+        parser = IncrementalParser()
+        content = ""
+        try:
+            async with client.stream(
+                "POST", _URL, headers=headers, content=orjson.dumps({**payload, "stream": True})
+            ) as r:
+                if r.status_code >= 400:
+                    body = await _read_capped(r)
+                    yield _sse("error", body.decode(errors="replace") or f"HTTP {r.status_code}")
+                    return
+                async for line in _aiter_capped_lines(r):
+                    if not line.startswith("data: "):
+                        continue
+                    chunk = line[len("data: "):]
+                    if chunk.strip() == "[DONE]":
+                        break
+                    try:
+                        choices = orjson.loads(chunk).get("choices", [])
+                        delta = choices[0].get("delta", {}).get("content") if choices else None
+                    except Exception:
+                        continue
+                    if not delta:
+                        continue
+                    content += delta
+                    if len(content) > _MAX_RESPONSE_BYTES:
+                        raise HTTPException(status_code=502, detail="Abacus response too large")
+                    for section, text in parser.feed(delta):
+                        yield _sse(section, text)
+        except HTTPException as exc:
+            yield _sse("error", exc.detail)
+            return
+        except Exception as exc:  # pragma: no cover
+            yield _sse("error", f"Abacus request failed: {exc}")
+            return
+        finally:
+            release()
+
+        if not content:
+            yield _sse("error", "Empty response from Abacus ChatLLM")
+            return
+
+        dockerfile_content, summary_content = _parse_content(content)
+        if dockerfile_content:
+            _cache_put(key, OptimizeResponse(result=dockerfile_content, summary=summary_content))
+        yield _sse("done", {"result": dockerfile_content, "summary": summary_content})
+
+    return _SlotStreamingResponse(gen(), release, media_type="text/event-stream")
+
+
+# Mount static at the end to avoid intercepting API routes; it also serves /index.html
+app.mount("/", PrecompressedStaticFiles(directory=static_dir, html=True), name="static")
 
 
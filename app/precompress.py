@@ -0,0 +1,39 @@
+"""
+Precompress static text assets at build time.
+
+Usage:
+    python -m app.precompress  # writes <file>.gz and <file>.br next to each asset
+"""
+
+import gzip
+import os
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - brotli is optional
+    brotli = None
+
+
+static_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), "static")
+
+COMPRESSIBLE_EXTENSIONS = (".html", ".css", ".js", ".svg", ".json", ".txt")
+
+
+def main() -> None:
+    for root, _dirs, files in os.walk(static_dir):
+        for name in files:
+            if not name.endswith(COMPRESSIBLE_EXTENSIONS):
+                continue
+            path = os.path.join(root, name)
+            with open(path, "rb") as f:
+                data = f.read()
+            with open(path + ".gz", "wb") as f:
+                f.write(gzip.compress(data, compresslevel=9, mtime=0))
+            if brotli is not None:
+                with open(path + ".br", "wb") as f:
+                    f.write(brotli.compress(data, quality=11))
+            print(f"Precompressed {os.path.relpath(path, static_dir)}")
+
+
+if __name__ == "__main__":
+    main()
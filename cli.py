@@ -7,27 +7,81 @@ Usage:
     python cli.py -i Dockerfile  # output to stdout
     cat Dockerfile | python cli.py  # read from stdin
     python cli.py -i Dockerfile -o /dev/stdout  # force stdout
+    python cli.py --batch paths.txt  # optimize each listed file to <path>.opt
 """
 
 import argparse
+import asyncio
 import os
 import sys
+import httpx
+import orjson
 import requests
 import re
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 
-def optimize_dockerfile(dockerfile_content: str, api_key: str, model: str = "gpt-5-mini") -> str:
-    """Optimize Dockerfile using Abacus API and return only the optimized Dockerfile."""
-    
-    system_prompt = (
-        "You are an expert DevOps assistant specialized in Dockerfile optimization. "
-        "Return your response in exactly this format:\n\n"
-        "```dockerfile\n[OPTIMIZED_DOCKERFILE_CONTENT]\n```\n\n"
-        "---SUMMARY---\n"
-        "[Brief summary of changes and optimizations made]\n\n"
-        "Do not include any other text or explanations outside these sections."
+_FENCE = "```"
+_SUMMARY_SEP = "---SUMMARY---"
+_FROM_RE = re.compile(r"^\s*FROM\s", re.IGNORECASE | re.MULTILINE)
+_URL = "https://routellm.abacus.ai/v1/chat/completions"
+_MAX_RESPONSE_BYTES = 256 * 1024
+_RETRY_TOTAL = 2
+_RETRY_BACKOFF = 0.5
+_RETRY_STATUSES = (429, 500, 502, 503, 504)
+_SYSTEM_PROMPT = (
+    "You are an expert DevOps assistant specialized in Dockerfile optimization. "
+    "Return your response in exactly this format:\n\n"
+    "```dockerfile\n[OPTIMIZED_DOCKERFILE_CONTENT]\n```\n\n"
+    "---SUMMARY---\n"
+    "[Brief summary of changes and optimizations made]\n\n"
+    "Do not include any other text or explanations outside these sections."
+)
+
+
+def create_session() -> requests.Session:
+    """Create a requests session with retry strategy."""
+    session = requests.Session()
+    retry_strategy = Retry(
+        total=_RETRY_TOTAL,
+        backoff_factor=_RETRY_BACKOFF,
+        status_forcelist=_RETRY_STATUSES,
+        # urllib3 skips POST by default; allow it for 429/5xx only. A read timeout
+        # means the completion may already be generated, so never resubmit on it.
+        allowed_methods=frozenset({"POST"}),
+        read=False,
+        raise_on_status=False,
     )
+    adapter = HTTPAdapter(max_retries=retry_strategy)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def read_capped(resp: requests.Response) -> bytes:
+    """Read a streamed response body, aborting once it exceeds the size cap."""
+    buf = bytearray()
+    for chunk in resp.iter_content(8192):
+        buf += chunk
+        if len(buf) > _MAX_RESPONSE_BYTES:
+            raise RuntimeError("response too large")
+    return bytes(buf)
+
+
+async def read_capped_async(resp: httpx.Response) -> bytes:
+    """Async variant of read_capped() for httpx streamed responses."""
+    buf = bytearray()
+    async for chunk in resp.aiter_bytes(8192):
+        buf += chunk
+        if len(buf) > _MAX_RESPONSE_BYTES:
+            raise RuntimeError("response too large")
+    return bytes(buf)
+
+
+def build_request(dockerfile_content: str, api_key: str, model: str) -> tuple:
+    """Build the Abacus request headers and payload for a Dockerfile."""
+    if not _FROM_RE.search(dockerfile_content):
+        raise RuntimeError("input does not appear to be a Dockerfile (no FROM instruction)")
 
     user_prompt = f"""
 Optimize the following Dockerfile for better performance, less layers, smaller image size, and faster build time.
@@ -39,43 +93,26 @@ Original Dockerfile:
 ```
 """
 
-    url = "https://routellm.abacus.ai/v1/chat/completions"
     headers = {
         "Authorization": f"Bearer {api_key}",
         "Content-Type": "application/json",
+        "Accept-Encoding": "gzip, deflate, br, zstd",
     }
     payload = {
         "model": model,
         "messages": [
-            {"role": "system", "content": system_prompt},
+            {"role": "system", "content": _SYSTEM_PROMPT},
             {"role": "user", "content": user_prompt},
         ],
         "stream": False,
         "temperature": 0.1,
         "max_tokens": 2000,
     }
+    return headers, payload
 
-    # Use session with retry strategy
-    session = requests.Session()
-    retry_strategy = Retry(
-        total=2,
-        backoff_factor=0.5,
-        status_forcelist=[429, 500, 502, 503, 504],
-    )
-    adapter = HTTPAdapter(max_retries=retry_strategy)
-    session.mount("http://", adapter)
-    session.mount("https://", adapter)
-
-    try:
-        resp = session.post(url, headers=headers, json=payload, timeout=90)
-        if resp.status_code >= 400:
-            raise RuntimeError(f"API request failed: {resp.status_code} - {resp.text}")
-        data = resp.json()
-    except requests.exceptions.Timeout:
-        raise RuntimeError("Request timeout - try with a simpler Dockerfile")
-    except Exception as exc:
-        raise RuntimeError(f"Abacus request failed: {exc}")
 
+def extract_dockerfile(data) -> str:
+    """Return only the optimized Dockerfile from a decoded Abacus response."""
     content = ""
     try:
         choices = data.get("choices", []) if isinstance(data, dict) else []
@@ -90,27 +127,128 @@ Original Dockerfile:
 
     # Extract only the Dockerfile content (ignore summary)
     dockerfile_content = ""
-    try:
-        # Split by summary separator and take only the first part
-        parts = content.split("---SUMMARY---", 1)
-        dockerfile_section = parts[0].strip()
-        
-        # Extract Dockerfile from fenced code block
-        match = re.search(r"```(?:dockerfile)?\s*([\s\S]*?)```", dockerfile_section, re.IGNORECASE)
-        if match:
-            dockerfile_content = match.group(1).strip()
-        else:
-            # Fallback: extract from first FROM line
-            lines = dockerfile_section.splitlines()
-            start_idx = next((i for i, ln in enumerate(lines) if ln.strip().upper().startswith("FROM ")), None)
-            if start_idx is not None:
-                dockerfile_content = "\n".join(lines[start_idx:]).strip()
-    except Exception:
-        dockerfile_content = content  # fallback to full content
+    dockerfile_section = content.partition(_SUMMARY_SEP)[0]
+
+    # Extract Dockerfile from fenced code block with two plain scans
+    start = dockerfile_section.find(_FENCE)
+    end = dockerfile_section.find(_FENCE, start + len(_FENCE)) if start >= 0 else -1
+    if end > 0:
+        body = dockerfile_section[start + len(_FENCE):end]
+        if body[:10].lower() == "dockerfile":
+            body = body[10:]
+        dockerfile_content = body.strip()
+    else:
+        # Fallback: extract from first FROM line
+        from_match = _FROM_RE.search(dockerfile_section)
+        if from_match:
+            dockerfile_content = dockerfile_section[from_match.start():].strip()
 
     return dockerfile_content
 
 
+def optimize_dockerfile(dockerfile_content: str, api_key: str, model: str = "gpt-5-mini") -> str:
+    """Optimize Dockerfile using Abacus API and return only the optimized Dockerfile."""
+    headers, payload = build_request(dockerfile_content, api_key, model)
+
+    # Use session with retry strategy
+    session = create_session()
+
+    try:
+        with session.post(_URL, headers=headers, data=orjson.dumps(payload), stream=True, timeout=90) as resp:
+            body = read_capped(resp)
+        if resp.status_code >= 400:
+            raise RuntimeError(f"API request failed: {resp.status_code} - {body.decode(errors='replace')}")
+        data = orjson.loads(body)
+    except requests.exceptions.Timeout:
+        raise RuntimeError("Request timeout - try with a simpler Dockerfile")
+    except Exception as exc:
+        raise RuntimeError(f"Abacus request failed: {exc}")
+
+    return extract_dockerfile(data)
+
+
+def retry_delay(resp: httpx.Response, attempt: int) -> float:
+    """Seconds to wait before retrying, honouring Retry-After like urllib3's Retry."""
+    retry_after = resp.headers.get("Retry-After", "")
+    if retry_after.isdigit():
+        return float(retry_after)
+    return _RETRY_BACKOFF * (2 ** attempt)
+
+
+async def optimize_dockerfile_async(
+    client: httpx.AsyncClient,
+    dockerfile_content: str,
+    api_key: str,
+    model: str = "gpt-5-mini",
+) -> str:
+    """Async variant of optimize_dockerfile() over a shared httpx client."""
+    headers, payload = build_request(dockerfile_content, api_key, model)
+
+    try:
+        # Retry 429/5xx with backoff, matching create_session()'s strategy
+        for attempt in range(_RETRY_TOTAL + 1):
+            async with client.stream(
+                "POST", _URL, headers=headers, content=orjson.dumps(payload), timeout=90
+            ) as resp:
+                body = await read_capped_async(resp)
+            if resp.status_code not in _RETRY_STATUSES or attempt == _RETRY_TOTAL:
+                break
+            await asyncio.sleep(retry_delay(resp, attempt))
+        if resp.status_code >= 400:
+            raise RuntimeError(f"API request failed: {resp.status_code} - {body.decode(errors='replace')}")
+        data = orjson.loads(body)
+    except httpx.TimeoutException:
+        raise RuntimeError("Request timeout - try with a simpler Dockerfile")
+    except Exception as exc:
+        raise RuntimeError(f"Abacus request failed: {exc}")
+
+    return extract_dockerfile(data)
+
+
+def read_batch_paths(batch_file: str, null_delimited: bool = False) -> list:
+    """Read Dockerfile paths from a list file ('-' for stdin), one per line or NUL-delimited."""
+    if batch_file == "-":
+        raw = sys.stdin.read()
+    else:
+        with open(batch_file, 'r') as f:
+            raw = f.read()
+    if null_delimited:
+        return [p for p in raw.split("\0") if p]
+    return [line.strip() for line in raw.splitlines() if line.strip()]
+
+
+async def optimize_batch(paths: list, api_key: str, model: str, concurrency: int = 8) -> int:
+    """Optimize each path to '<path>.opt' concurrently; return the number of failures."""
+    sem = asyncio.Semaphore(concurrency)
+
+    async def one(path: str, client: httpx.AsyncClient) -> bool:
+        async with sem:
+            try:
+                with open(path, 'r') as f:
+                    dockerfile_content = f.read()
+                if not dockerfile_content.strip():
+                    raise RuntimeError("No Dockerfile content provided")
+                print(f"Optimizing {path}...", file=sys.stderr)
+                optimized = await optimize_dockerfile_async(client, dockerfile_content, api_key, model)
+                with open(path + ".opt", 'w') as f:
+                    f.write(optimized)
+                print(f"Optimized Dockerfile written to: {path}.opt", file=sys.stderr)
+                return True
+            except Exception as e:
+                print(f"Error: {path}: {e}", file=sys.stderr)
+                return False
+
+    # AsyncClient ignores limits when a transport is passed, so set them here
+    transport = httpx.AsyncHTTPTransport(
+        http2=True,
+        retries=_RETRY_TOTAL,
+        limits=httpx.Limits(max_connections=concurrency),
+    )
+    async with httpx.AsyncClient(transport=transport) as client:
+        results = await asyncio.gather(*[one(path, client) for path in paths])
+    return results.count(False)
+
+
 def main():
     parser = argparse.ArgumentParser(
         description="Dockerfile AI Optimizer CLI",
@@ -121,6 +259,8 @@ Examples:
   python cli.py -i Dockerfile  # output to stdout
   cat Dockerfile | python cli.py  # read from stdin
   python cli.py -i Dockerfile -o /dev/stdout  # force stdout
+  python cli.py --batch paths.txt  # optimize each listed file to <path>.opt
+  find . -name Dockerfile -print0 | python cli.py --batch - -0
         """
     )
     
@@ -145,6 +285,25 @@ Examples:
         help="Abacus API key (default: read from ABACUS_API_KEY env var)"
     )
 
+    parser.add_argument(
+        "--batch",
+        metavar="FILE",
+        help="File listing Dockerfile paths, one per line ('-' for stdin); each is written to <path>.opt"
+    )
+
+    parser.add_argument(
+        "-0", "--null",
+        action="store_true",
+        help="Paths in --batch input are NUL-delimited (e.g. find -print0)"
+    )
+
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=8,
+        help="Maximum concurrent requests in --batch mode (default: 8)"
+    )
+
     args = parser.parse_args()
 
     # Get API key
@@ -154,6 +313,24 @@ Examples:
         print("Set it with: export ABACUS_API_KEY=your_key_here", file=sys.stderr)
         sys.exit(1)
 
+    if args.batch:
+        try:
+            paths = read_batch_paths(args.batch, args.null)
+        except FileNotFoundError:
+            print(f"Error: Batch file '{args.batch}' not found", file=sys.stderr)
+            sys.exit(1)
+        except Exception as e:
+            print(f"Error reading batch file: {e}", file=sys.stderr)
+            sys.exit(1)
+        if not paths:
+            print("Error: No Dockerfile paths provided", file=sys.stderr)
+            sys.exit(1)
+        if args.concurrency < 1:
+            print("Error: --concurrency must be at least 1", file=sys.stderr)
+            sys.exit(1)
+        failures = asyncio.run(optimize_batch(paths, api_key, args.model, args.concurrency))
+        sys.exit(1 if failures else 0)
+
     # Read input
     if args.input:
         try: